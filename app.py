@@ -1,14 +1,27 @@
 # app.py
 import os
-import warnings
+import re
+import base64
+import hashlib
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+from urllib.request import urlopen
+import numpy as np
 import pandas as pd
 from datetime import datetime, date, time as dtime, timedelta
 
 import pytds
 from pytds.tds_base import TDS74, TDS73, TDS72
 
+import flask
 import dash
 from dash import Dash, dcc, html, dash_table, Input, Output, State
+from dash.exceptions import PreventUpdate
 
 # =========================
 # KONFIG
@@ -29,18 +42,41 @@ elif _env_tds == "72":
 else:
     PREFERRED_TDS = TDS74
 
-warnings.filterwarnings(
-    "ignore",
-    message=r"pandas only supports SQLAlchemy connectable.*",
-    category=UserWarning,
-)
-
 # window za PRIJAVE (dolazak)
 WINDOW_BEFORE_MIN = 60   # min prije termina
 WINDOW_AFTER_MIN  = 30   # min poslije termina
 
 PAGE_AUTO_IN_BEFORE_MIN = 60  # auto-paging od T-60 do T
 
+# gotove tablice (records + stilovi) po (strana, datum, termin) vrijede ovoliko sekundi
+TABLE_CACHE_SEC = 10
+
+# timer tik ne osvježava tablicu ako je za isti datum/termin već osvježena prije manje od ovoga
+MIN_REFRESH_SEC = 10
+
+# auto-refresh tablica: češće u [T-60, T) kad čuvari dolaze, inače rjeđe
+REFRESH_FAST_MS = 15_000
+REFRESH_SLOW_MS = 120_000
+
+# jedini dcc.Interval u layoutu; svi ostali ritmovi (refresh, paging, pulse) su mu višekratnici
+MASTER_TICK_MS = 5_000
+PULSE_MS       = 60_000
+
+# pozadinska nit svakih SNAPSHOT_SEC sekundi osvježi današnje tablice koje netko gleda
+# (0 = isključeno, tablice se onda računaju samo na zahtjev)
+SNAPSHOT_SEC = int(os.getenv("SNAPSHOT_SEC", "30"))
+
+# prikaz vremena u tablicama
+TIME_FMT = "%d.%m.%Y. %H:%M:%S"
+
+# _norm_room: brisanje razmaka jednim C prolazom (str.translate), bez regexa
+# isti skup bjelina briše i SQL strana (_sql_norm_room) → učionice se jednako uspoređuju
+_ROOM_WS = " \t\n\r\f\v\xa0"
+_WS_TABLE = str.maketrans("", "", _ROOM_WS)
+
+# regexi (kompajlirani jednom, ne po pozivu)
+_ROOM_RE = re.compile(r"^([A-Za-zČĆŽŠĐ]*)\D*(\d*)")   # sort_rooms_natural: "A101" → ("A", 101)
+
 # debug info
 brojac = 0
 LAST_DB_ERROR = ""
@@ -48,90 +84,488 @@ LAST_DB_ERROR = ""
 # =========================
 # DB helper
 # =========================
-def fetch_data_from_db(query: str, params=None) -> pd.DataFrame | None:
-    global brojac, LAST_DB_ERROR, PREFERRED_TDS
-    for ver in [PREFERRED_TDS, TDS73, TDS72, None]:
+# mali pool trajnih konekcija; konekciju u jednom trenutku drži jedna dretva
+# (pytds konekcija nije thread-safe), a paralelni upiti iz _POOL ne čekaju jedni druge.
+# Semafor ograničava sve istovremene konekcije (i nove, ne samo one u poolu):
+# kad su sve zauzete, sljedeći čeka najviše POOL_WAIT_SEC
+POOL_SIZE     = 4
+POOL_WAIT_SEC = 15
+_CONN_POOL: queue.Queue = queue.Queue(maxsize=POOL_SIZE)
+_CONN_SLOTS = threading.BoundedSemaphore(POOL_SIZE)
+_TDS_NEGOTIATED = False   # nakon prvog uspjeha spajamo se samo s PREFERRED_TDS
+
+# ako driver/server ne vrati sve result setove iz batcha, fetch_many
+# prelazi na paralelne pojedinačne upite
+BATCH_SUPPORTED = True
+_BATCH_MISMATCH = object()   # fetch_many: batch je vratio krivi broj result setova
+_POOL = ThreadPoolExecutor(max_workers=3)
+
+def _connect():
+    """
+    Nova konekcija. TDS fallback (74 → 73 → 72 → default) samo dok se prvi put
+    ne spojimo; poslije toga koristimo dogovorenu PREFERRED_TDS.
+    """
+    global LAST_DB_ERROR, PREFERRED_TDS, _TDS_NEGOTIATED
+    versions = [PREFERRED_TDS] if _TDS_NEGOTIATED else [PREFERRED_TDS, TDS73, TDS72, None]
+    last_exc = None
+    for ver in versions:
         try:
-            kw = dict(port=DB_PORT, login_timeout=5, timeout=10, autocommit=True)
+            kw = dict(port=DB_PORT, login_timeout=5, timeout=10, autocommit=True, as_dict=False)
             if ver is not None:
                 kw["tds_version"] = ver
-            with pytds.connect(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, **kw) as conn:
-                df = pd.read_sql(query, conn, params=params)
-            brojac += 1
-            LAST_DB_ERROR = ""
+            conn = pytds.connect(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, **kw)
             if ver is not None:
                 PREFERRED_TDS = ver
-            return df
+                _TDS_NEGOTIATED = True
+            return conn
         except Exception as e:
+            last_exc = e
             LAST_DB_ERROR = f"{type(e).__name__}: {e}"
-            continue
+    raise last_exc
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+@contextmanager
+def get_conn():
+    """
+    Konekcija iz poola (ili nova ako je pool prazan). Nakon uspjeha se vraća u
+    pool; ako je upit pukao, konekcija se zatvara jer joj ne vjerujemo.
+    Najviše POOL_SIZE konekcija je otvoreno istovremeno (_CONN_SLOTS).
+    Yielda (conn, reused).
+    """
+    if not _CONN_SLOTS.acquire(timeout=POOL_WAIT_SEC):
+        raise TimeoutError(f"sve DB konekcije ({POOL_SIZE}) zauzete dulje od {POOL_WAIT_SEC} s")
+    try:
+        try:
+            conn, reused = _CONN_POOL.get_nowait(), True
+        except queue.Empty:
+            conn, reused = _connect(), False
+        try:
+            yield conn, reused
+        except BaseException:
+            _close_quietly(conn)
+            raise
+        try:
+            _CONN_POOL.put_nowait(conn)
+        except queue.Full:
+            _close_quietly(conn)
+    finally:
+        _CONN_SLOTS.release()
+
+def _with_db(work):
+    """
+    Pozovi work(conn) na konekciji iz poola. Ako pukne na već korištenoj
+    konekciji (npr. server ju je zatvorio), uzmi drugu i probaj još jednom.
+    """
+    global brojac, LAST_DB_ERROR
+    for _ in range(2):
+        reused = False
+        try:
+            with get_conn() as (conn, reused):
+                result = work(conn)
+            brojac += 1
+            LAST_DB_ERROR = ""
+            return result
+        except Exception as e:
+            LAST_DB_ERROR = f"{type(e).__name__}: {e}"
+            if not reused:   # svježe spajanje/upit nije uspio → nema smisla ponavljati
+                break
     print("⛔ Greška u konekciji/SQL:", LAST_DB_ERROR)
     return None
 
+def _frame_from_cursor(cur) -> pd.DataFrame:
+    """Redovi s kursora → DataFrame (bez pd.read_sql); datume parsira _prep_* jednom po stupcu"""
+    cols = [c[0] for c in cur.description]
+    return pd.DataFrame.from_records(cur.fetchall(), columns=cols)
+
+def fetch_data_from_db(query: str, params=None) -> pd.DataFrame | None:
+    def work(conn):
+        with conn.cursor() as cur:
+            cur.execute(query, params or ())
+            return _frame_from_cursor(cur)
+    return _with_db(work)
+
+def fetch_many(queries_with_params: list[tuple[str, list | None]]) -> list[pd.DataFrame] | None:
+    """
+    Više SELECT-ova u jednom batchu (jedna konekcija, jedan round-trip).
+    Vraća po jedan DataFrame za svaki upit, istim redom.
+    """
+    global BATCH_SUPPORTED
+    if not BATCH_SUPPORTED:
+        return fetch_parallel(queries_with_params)
+    sql = ";\n".join(q.strip() for q, _ in queries_with_params) + ";"
+    params = tuple(p for _, ps in queries_with_params for p in (ps or []))
+
+    def work(conn):
+        frames = []
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            while True:
+                if cur.description:
+                    frames.append(_frame_from_cursor(cur))
+                if not cur.nextset():
+                    break
+        # krivi broj result setova nije greška konekcije → bez iznimke (_with_db bi
+        # ponovio batch, zatvorio zdravu konekciju i prijavio grešku u bazi)
+        return frames if len(frames) == len(queries_with_params) else _BATCH_MISMATCH
+
+    frames = _with_db(work)
+    if frames is _BATCH_MISMATCH:
+        BATCH_SUPPORTED = False
+        print(f"ℹ️ Batch nije vratio {len(queries_with_params)} result setova → dalje paralelni upiti")
+        return fetch_parallel(queries_with_params)
+    return frames
+
+def fetch_parallel(queries_with_params: list[tuple[str, list | None]]) -> list[pd.DataFrame] | None:
+    """
+    Isti upiti kao fetch_many, ali svaki zasebno i istovremeno (svaki na svojoj
+    konekciji iz poola) → trajanje ≈ najsporiji upit, ne zbroj.
+    """
+    futures = [_POOL.submit(fetch_data_from_db, q, p) for q, p in queries_with_params]
+    frames = [f.result() for f in futures]
+    return None if any(f is None for f in frames) else frames
+
 # =========================
 # Dohvati podatke
 # =========================
 def _norm_room(s: pd.Series) -> pd.Series:
-    return (s.astype(str).str.strip().str.upper().str.replace(r"\s+", "", regex=True))
+    """trim + bez razmaka + velika slova, jednim prolazom kroz vrijednosti"""
+    return pd.Series([str(v).upper().translate(_WS_TABLE) for v in s.to_numpy(dtype=object)], index=s.index)
 
-def fetch_raspored_for_date(d: date) -> pd.DataFrame:
+def _error_frame(columns: list[str]) -> pd.DataFrame:
+    """Prazan frame za slučaj greške u bazi (označen da ga ttl_cache ne pamti)."""
+    df = pd.DataFrame(columns=columns)
+    df.attrs["db_error"] = True
+    return df
+
+# upiti kao (sql, params) da se mogu slati pojedinačno ili u batchu (fetch_many)
+def _day_range(d: date) -> tuple[datetime, datetime]:
+    """[00:00 dana d, 00:00 idućeg dana) → termin >= od AND termin < do (sargable, ide po indeksu)"""
+    start = datetime.combine(d, dtime(0, 0))
+    return start, start + timedelta(days=1)
+
+def q_raspored_for_date(d: date) -> tuple[str, list]:
     q = """
-        SELECT termin, [učionica] AS ucionica, [state]
+        SELECT termin, [učionica] AS ucionica
         FROM dbo.ispiti_raspored
         WHERE [state] = 1
-          AND CONVERT(date, termin) = CONVERT(date, %s)
+          AND termin >= %s AND termin < %s
+    """
+    return q, list(_day_range(d))
+
+def _sql_norm_room(col: str) -> str:
+    """SQL ekvivalent _norm_room: bez bjelina iz _ROOM_WS (razmak, tab, novi red, NBSP...), velika slova"""
+    expr = col
+    for ch in _ROOM_WS:
+        expr = f"REPLACE({expr}, NCHAR({ord(ch)}), '')"
+    return f"UPPER({expr})"
+
+def q_log_for_termin(d: date, hhmm: str,
+                     start: datetime | None = None, end: datetime | None = None) -> tuple[str, list]:
     """
-    df = fetch_data_from_db(q, params=[d])
+    Prijave (state = 1) i odjave (state = 0) dana d: server vraća samo logove
+    koji padaju u prozor neke učionice s terminom u HH:MM (prijave: [T-before, T+after), odjave: [T, T_next)),
+    već mapirane na najbliži termin (stupac termin) i bez ponovljenih očitanja.
+    start/end (vidi log_time_bounds) sužavaju [time] na raspon svih prozora
+    → index seek umjesto cijelog dana. Raspon je uvijek derived table b: sa
+    start/end su to dva parametra, bez njih ga računa sam SQL, pa je upit
+    uzak i kad raspored još nije u cacheu.
+    """
+    day_end = datetime.combine(d, dtime(23,59,59))
+    day_start, day_next = _day_range(d)
+    if start is None or end is None:
+        bounds_join = """
+        CROSS JOIN (
+            SELECT DATEADD(minute, -%s, t.t0) AS lo,
+                   CASE WHEN nx.t_next > DATEADD(minute, %s, t.t1) THEN nx.t_next
+                        ELSE DATEADD(minute, %s, t.t1) END AS hi
+            FROM (SELECT MIN(termin) AS t0, MAX(termin) AS t1
+                  FROM dbo.ispiti_raspored
+                  WHERE [state] = 1
+                    AND termin >= %s AND termin < %s
+                    AND CONVERT(char(5), termin, 108) = %s) t
+            CROSS APPLY (SELECT ISNULL(MIN(r2.termin), %s) AS t_next
+                         FROM dbo.ispiti_raspored r2
+                         WHERE r2.[state] = 1 AND r2.termin > t.t0 AND r2.termin < %s) nx
+        ) b"""
+        bounds_params = [WINDOW_BEFORE_MIN, WINDOW_AFTER_MIN, WINDOW_AFTER_MIN,
+                         day_start, day_next, hhmm, day_end, day_next]
+    else:
+        # raspon kao derived table b (kao gore) → parametri granica ostaju
+        # ispred CROSS APPLY parametara, istim redom kao placeholderi
+        bounds_join = """
+        CROSS JOIN (SELECT %s AS lo, %s AS hi) b"""
+        bounds_params = [start, end]
+    q = f"""
+        SELECT x.[time], x.uid_kartice, x.ucionica, x.[state], x.termin
+        FROM (
+            SELECT l.[time], l.[card_no] AS uid_kartice, l.[device_name] AS ucionica, l.[state], a.termin,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY l.[state], l.[time], {_sql_norm_room("l.[device_name]")}, l.[card_no]
+                       ORDER BY (SELECT NULL)
+                   ) AS rn
+            FROM dbo.acc_monitor_log l{bounds_join}
+            CROSS APPLY (
+                -- najbliži termin te učionice u čiji prozor log upada
+                SELECT TOP 1 r.termin
+                FROM dbo.ispiti_raspored r
+                WHERE r.[state] = 1
+                  AND r.termin >= %s AND r.termin < %s
+                  AND CONVERT(char(5), r.termin, 108) = %s
+                  AND {_sql_norm_room("r.[učionica]")} = {_sql_norm_room("l.[device_name]")}
+                  AND (
+                      (l.[state] = 1
+                       AND l.[time] >= DATEADD(minute, -%s, r.termin)
+                       AND l.[time] <  DATEADD(minute,  %s, r.termin))
+                   OR (l.[state] = 0
+                       AND l.[time] >= r.termin
+                       AND l.[time] <  ISNULL((SELECT MIN(r2.termin) FROM dbo.ispiti_raspored r2
+                                               WHERE r2.[state] = 1 AND r2.termin > r.termin
+                                                 AND r2.termin < %s), %s))
+                  )
+                ORDER BY ABS(DATEDIFF(second, r.termin, l.[time]))
+            ) a
+            WHERE l.[state] IN (0, 1) AND l.[time] >= b.lo AND l.[time] <= b.hi
+        ) x
+        WHERE x.rn = 1
+    """
+    params = bounds_params + [day_start, day_next, hhmm, WINDOW_BEFORE_MIN, WINDOW_AFTER_MIN, day_next, day_end]
+    if q.count("%s") != len(params):   # ne assert: python -O bi ga izbacio
+        raise ValueError(f"q_log_for_termin: {q.count('%s')} placeholdera, {len(params)} parametara")
+    return q, params
+
+def q_kartice() -> tuple[str, None]:
+    return """SELECT [Čuvar] AS cuvar, [UID kartice] AS uid_kartice FROM dbo.cuvari_kartice""", None
+
+def _prep_raspored(df: pd.DataFrame | None) -> pd.DataFrame:
     if df is None:
-        return pd.DataFrame(columns=["termin","ucionica","state"])
+        return _error_frame(["termin","termin_hm","ucionica"])
     if df.empty: return df
     df["termin"]   = pd.to_datetime(df["termin"])
-    df["ucionica"] = _norm_room(df["ucionica"])
+    # HH:MM kao int (1830) → filtriranje po terminu je jedna int usporedba
+    df["termin_hm"] = (df["termin"].dt.hour * 100 + df["termin"].dt.minute).astype(np.int16)
+    # malo učionica, puno redaka → category (merge/drop_duplicates po int kodovima)
+    df["ucionica"] = _norm_room(df["ucionica"]).astype("category")
     return df
 
-def fetch_login_log_for_date(d: date) -> pd.DataFrame:
-    start = datetime.combine(d, dtime(0,0,0))
-    end   = datetime.combine(d, dtime(23,59,59))
-    q = """
-        SELECT [time], [card_no] AS uid_kartice, [device_name] AS ucionica, [state]
-        FROM dbo.acc_monitor_log
-        WHERE [state] = 1 AND [time] >= %s AND [time] <= %s
-    """
-    df = fetch_data_from_db(q, params=[start, end])
+def _hm(hhmm: str) -> int:
+    """"18:30" → 1830 (za usporedbu s termin_hm)"""
+    return int(hhmm[:2]) * 100 + int(hhmm[3:5])
+
+def _hhmm(hm: int) -> str:
+    """1830 → "18:30" (samo za prikaz)"""
+    return f"{hm // 100:02d}:{hm % 100:02d}"
+
+def _prep_log(df: pd.DataFrame | None) -> pd.DataFrame:
     if df is None:
-        return pd.DataFrame(columns=["time","uid_kartice","ucionica","state"])
+        return _error_frame(["time","uid_kartice","ucionica","state"])
     if df.empty: return df
     df["time"]        = pd.to_datetime(df["time"])
+    if "termin" in df.columns:   # q_log_for_termin: termin je dodijelio SQL
+        df["termin"]  = pd.to_datetime(df["termin"])
     df["ucionica"]    = _norm_room(df["ucionica"])
     df["uid_kartice"] = df["uid_kartice"].astype(str).str.strip()
     return df
 
-def fetch_logout_log_for_date(d: date) -> pd.DataFrame:
-    start = datetime.combine(d, dtime(0,0,0))
-    end   = datetime.combine(d, dtime(23,59,59))
-    q = """
-        SELECT [time], [card_no] AS uid_kartice, [device_name] AS ucionica, [state]
-        FROM dbo.acc_monitor_log
-        WHERE [state] = 0 AND [time] >= %s AND [time] <= %s
-    """
-    df = fetch_data_from_db(q, params=[start, end])
+def _prep_kartice(df: pd.DataFrame | None) -> pd.DataFrame:
     if df is None:
-        return pd.DataFrame(columns=["time","uid_kartice","ucionica","state"])
+        return _error_frame(["cuvar","uid_kartice"])
     if df.empty: return df
-    df["time"]        = pd.to_datetime(df["time"])
-    df["ucionica"]    = _norm_room(df["ucionica"])
     df["uid_kartice"] = df["uid_kartice"].astype(str).str.strip()
+    # uid → čuvar jednom po dohvatu; frame se cachira pa i mapa s njim
+    df.attrs["cuvar_map"] = dict(zip(df["uid_kartice"].tolist(), df["cuvar"].tolist()))
     return df
 
+# =========================
+# TTL cache (in-process)
+# =========================
+def ttl_cache(seconds: int):
+    """
+    Pamti rezultat po argumentima `seconds` sekundi. Ne pamti None ni frameove
+    nastale zbog greške u bazi, a sve brišemo kad se promijeni dan.
+    Dodaje .cache_get(*args), .cache_put(value, *args), .cache_pop(*args) i .cache_clear().
+    """
+    def deco(fn):
+        cache: dict[tuple, tuple[float, date, pd.DataFrame]] = {}
+        lock = threading.Lock()
+
+        def cache_get(*args):
+            now, today = time.monotonic(), date.today()
+            with lock:
+                hit = cache.get(args)
+                if hit is None:
+                    return None
+                expiry, day, value = hit
+                if day != today:          # prijelaz dana → invalidiraj sve
+                    cache.clear()
+                    return None
+                return value if now < expiry else None
+
+        def cache_put(value, *args):
+            if value is None or getattr(value, "attrs", {}).get("db_error"):
+                return
+            with lock:
+                cache[args] = (time.monotonic() + seconds, date.today(), value)
+
+        def cache_pop(*args):
+            with lock:
+                cache.pop(args, None)
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        @wraps(fn)
+        def wrapper(*args):
+            value = cache_get(*args)
+            if value is None:
+                value = fn(*args)
+                cache_put(value, *args)
+            return value
+
+        wrapper.cache_get   = cache_get
+        wrapper.cache_put   = cache_put
+        wrapper.cache_pop   = cache_pop
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return deco
+
+_TABLE_CACHE: dict[tuple, tuple[float, list]] = {}
+_TABLE_CACHE_LOCK = threading.Lock()
+
+def table_cache_get(key: tuple) -> list | None:
+    with _TABLE_CACHE_LOCK:
+        hit = _TABLE_CACHE.get(key)
+        if hit is None:
+            return None
+        if time.monotonic() >= hit[0]:
+            del _TABLE_CACHE[key]
+            return None
+        return hit[1]
+
+def table_cache_put(key: tuple, recs: list):
+    now = time.monotonic()
+    with _TABLE_CACHE_LOCK:
+        for k in [k for k, v in _TABLE_CACHE.items() if now >= v[0]]:   # počisti istekle
+            del _TABLE_CACHE[k]
+        _TABLE_CACHE[key] = (now + TABLE_CACHE_SEC, recs)
+
+def flush_caches():
+    """Ručna invalidacija svih cacheva (npr. nakon izmjene rasporeda/kartica)."""
+    for fn in (fetch_raspored_for_date, fetch_log_for_termin, fetch_kartice, fetch_min_date_in_raspored):
+        fn.cache_clear()
+    with _TABLE_CACHE_LOCK:
+        _TABLE_CACHE.clear()
+    with _SNAPSHOT_LOCK:
+        _SNAPSHOT.clear()
+    with _TABLE_MEMO_LOCK:
+        _TABLE_MEMO.clear()
+    with _ROOMS_INDEX_LOCK:
+        _ROOMS_INDEX.clear()
+
+def _nocache_requested() -> bool:
+    """`?nocache=1` u URL-u stranice → ručni refresh mimo cachea."""
+    try:
+        page_url = flask.request.referrer or flask.request.url
+    except RuntimeError:  # izvan request konteksta
+        return False
+    return parse_qs(urlparse(page_url).query).get("nocache", [""])[0] == "1"
+
+@ttl_cache(seconds=60)
+def fetch_raspored_for_date(d: date) -> pd.DataFrame:
+    return _prep_raspored(fetch_data_from_db(*q_raspored_for_date(d)))
+
+def _split_states(logs: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """→ (prijave [state = 1], odjave [state = 0]); sam state dalje ne nosimo"""
+    cols = [c for c in logs.columns if c != "state"]
+    is_login = logs["state"] == 1
+    return logs.loc[is_login, cols], logs.loc[~is_login, cols]
+
+# prijave i odjave dolaze istim upitom; kratki TTL da ga druga tablica
+# u istom tiku ne ponavlja
+@ttl_cache(seconds=5)
+def fetch_log_for_termin(d: date, hhmm: str) -> pd.DataFrame:
+    return _prep_log(fetch_data_from_db(*q_log_for_termin(d, hhmm)))
+
+@ttl_cache(seconds=300)
 def fetch_kartice() -> pd.DataFrame:
-    q = """SELECT [Čuvar] AS cuvar, [UID kartice] AS uid_kartice FROM dbo.cuvari_kartice"""
-    df = fetch_data_from_db(q)
-    if df is None:
-        return pd.DataFrame(columns=["cuvar","uid_kartice"])
-    if df.empty: return df
-    df["uid_kartice"] = df["uid_kartice"].astype(str).str.strip()
-    return df
+    return _prep_kartice(fetch_data_from_db(*q_kartice()))
 
+def log_time_bounds(raspored: pd.DataFrame, d: date, hhmm: str) -> tuple[datetime, datetime] | None:
+    """Najraniji početak i najkasniji kraj prozora (prijave + odjave) za HH:MM; None ako termina nema."""
+    w = pd.concat([build_windows_for_time_login(raspored, hhmm),
+                   build_windows_for_time_logout(raspored, hhmm, d)])
+    if w.empty:
+        return None
+    return pd.Timestamp(w["window_start"].min()).to_pydatetime(), pd.Timestamp(w["window_end"].max()).to_pydatetime()
+
+def fetch_tick(d: date, hhmm: str, use_cache: bool = True) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    raspored + logovi (samo prozori termina HH:MM) + kartice
+    → (raspored, prijave, odjave, kartice).
+    Što je svježe u cacheu ide iz cachea; ostatak u jednom batchu (jedan
+    round-trip; ako server ne vrati sve result setove, fetch_many prelazi na
+    fetch_parallel → upiti istovremeno, trajanje ≈ najsporiji, ne zbroj).
+    """
+    raspored = fetch_raspored_for_date.cache_get(d) if use_cache else None
+    logs     = fetch_log_for_termin.cache_get(d, hhmm) if use_cache else None
+    kartice  = fetch_kartice.cache_get() if use_cache else None
+
+    # dan bez ispita (prazan raspored iz cachea) → ni logovi ni kartice ne trebaju
+    if raspored is not None and raspored.empty:
+        no_logs = pd.DataFrame(columns=["time","uid_kartice","ucionica"])
+        return raspored, no_logs, no_logs, (kartice if kartice is not None else pd.DataFrame(columns=["cuvar","uid_kartice"]))
+
+    # u cache idu samo logovi dohvaćeni (ili složeni) u ovom tiku; ponovni put
+    # pogotka iz cachea bi pomicao TTL pa logovi pri čestom pollanju ne bi istekli
+    logs_fresh = logs is None
+
+    # uz raspored iz cachea raspon prozora računamo ovdje (ili log upit preskočimo);
+    # inače ga računa SQL u istom batchu
+    if logs is None and raspored is not None:
+        bounds = log_time_bounds(raspored, d, hhmm)
+        if bounds is None:
+            logs = pd.DataFrame(columns=["time","uid_kartice","ucionica","state","termin"])
+    else:
+        bounds = None
+
+    queries = []
+    if logs is None:
+        queries.append(q_log_for_termin(d, hhmm, *(bounds or ())))
+    if raspored is None:
+        queries.append(q_raspored_for_date(d))
+    if kartice is None:
+        queries.append(q_kartice())
+
+    if queries:
+        frames = fetch_many(queries)
+        if frames is None:
+            frames = [None] * len(queries)
+        frames = iter(frames)
+        if logs is None:
+            logs = _prep_log(next(frames))
+        if raspored is None:
+            raspored = _prep_raspored(next(frames))
+            fetch_raspored_for_date.cache_put(raspored, d)
+        if kartice is None:
+            kartice = _prep_kartice(next(frames))
+            fetch_kartice.cache_put(kartice)
+
+    # iste kategorije učionica kao raspored, da se join radi po kodovima
+    rooms_dtype = raspored["ucionica"].dtype
+    if not logs.empty and isinstance(rooms_dtype, pd.CategoricalDtype) and logs["ucionica"].dtype != rooms_dtype:
+        logs = logs.assign(ucionica=logs["ucionica"].astype(rooms_dtype))
+    if logs_fresh:
+        fetch_log_for_termin.cache_put(logs, d, hhmm)
+
+    logins, logouts = _split_states(logs)
+    return raspored, logins, logouts, kartice
+
+@ttl_cache(seconds=3600)
 def fetch_min_date_in_raspored() -> date | None:
     q = "SELECT MIN(CONVERT(date, termin)) AS d FROM dbo.ispiti_raspored WHERE [state]=1"
     df = fetch_data_from_db(q)
@@ -142,19 +576,19 @@ def fetch_min_date_in_raspored() -> date | None:
 # =========================
 # Prozor/Mapiranje — PRIJAVE (dolazak)
 # =========================
-def build_windows_for_time_login(raspored: pd.DataFrame, hhmm: str) -> pd.DataFrame:
-    """[termin - WINDOW_BEFORE_MIN, termin + WINDOW_AFTER_MIN]"""
+def build_windows_for_time_login(raspored: pd.DataFrame, hhmm: str, d: date | None = None) -> pd.DataFrame:
+    """[termin - WINDOW_BEFORE_MIN, termin + WINDOW_AFTER_MIN] (d samo radi istog potpisa kao kod odjava)"""
     if raspored is None or raspored.empty:
         return pd.DataFrame(columns=["ucionica","termin","window_start","window_end"])
-    r = raspored.copy()
-    r["termin"] = pd.to_datetime(r["termin"])
-    r = r[r["termin"].dt.strftime("%H:%M") == hhmm].copy()
+    # raspored dolazi iz cachea → ne mijenjamo ga, samo maskiramo
+    r = raspored.loc[raspored["termin_hm"] == _hm(hhmm), ["ucionica","termin"]]
     if r.empty:
         return pd.DataFrame(columns=["ucionica","termin","window_start","window_end"])
-    r["window_start"] = r["termin"] - pd.Timedelta(minutes=WINDOW_BEFORE_MIN)
-    r["window_end"]   = r["termin"] + pd.Timedelta(minutes=WINDOW_AFTER_MIN)
     r = r.drop_duplicates(subset=["ucionica","termin"])
-    return r[["ucionica","termin","window_start","window_end"]]
+    return r.assign(
+        window_start=r["termin"] - pd.Timedelta(minutes=WINDOW_BEFORE_MIN),
+        window_end=r["termin"] + pd.Timedelta(minutes=WINDOW_AFTER_MIN),
+    )
 
 # =========================
 # Prozor/Mapiranje — ODJAVE (odlazak)
@@ -169,52 +603,49 @@ def build_windows_for_time_logout(raspored: pd.DataFrame, hhmm: str, d: date) ->
     if raspored is None or raspored.empty:
         return pd.DataFrame(columns=["ucionica","termin","window_start","window_end"])
 
-    r = raspored.copy()
-    r["termin"] = pd.to_datetime(r["termin"])
+    r = raspored  # iz cachea → samo čitamo
 
     # svi termini tog sata (može ih biti više po učionici)
-    r_sel = r[r["termin"].dt.strftime("%H:%M") == hhmm].copy()
+    r_sel = r[r["termin_hm"] == _hm(hhmm)]
     if r_sel.empty:
         return pd.DataFrame(columns=["ucionica","termin","window_start","window_end"])
 
     # početak T je najraniji termin s tim HH:MM (ako su sekunde različite)
     start_ts = r_sel["termin"].min()
 
-    # globalni sljedeći termin u danu
-    all_times = sorted(r["termin"].unique().tolist())
-    next_ts = next((t for t in all_times if t > start_ts), None)
+    # globalni sljedeći termin u danu: binarno pretraživanje po datetime64 (int64 ns)
+    all_times = np.sort(r["termin"].to_numpy(dtype="datetime64[ns]"))
+    idx = np.searchsorted(all_times, np.datetime64(start_ts, "ns"), side="right")
+    next_ts = pd.Timestamp(all_times[idx]) if idx < len(all_times) else None
 
     day_end = datetime.combine(d, dtime(23, 59, 59))
     end_ts = next_ts if next_ts is not None else day_end
 
-    rooms = r_sel[["ucionica"]].drop_duplicates().copy()
-    rooms["termin"] = start_ts
-    rooms["window_start"] = start_ts
-    rooms["window_end"] = end_ts
-    return rooms[["ucionica","termin","window_start","window_end"]]
+    rooms = r_sel[["ucionica"]].drop_duplicates()
+    return rooms.assign(termin=start_ts, window_start=start_ts, window_end=end_ts)
 
 
 def assign_logs_to_windows(log_df: pd.DataFrame, windows: pd.DataFrame, kartice: pd.DataFrame) -> pd.DataFrame:
     """
-    Spajanje po učionici + vremenskom prozoru. Radi i za prijave i za odjave.
+    Logovi (iz q_log_for_termin) → retci tablice. SQL je logove već spojio po
+    učionici + vremenskom prozoru, dodijelio najbliži termin (stupac termin) i
+    maknuo ponovljena očitanja; ovdje se samo dodaju čuvari. Radi i za prijave i za odjave.
     Vraća: ucionica, vrijeme, broj_kartice, cuvar, termin
     """
     if log_df is None or log_df.empty or windows is None or windows.empty:
         return pd.DataFrame(columns=["ucionica","vrijeme","broj_kartice","cuvar","termin"])
 
-    df = log_df.copy()
-    k  = kartice.copy()
-
-    df = df.merge(k, on="uid_kartice", how="left")
-    j  = df.merge(windows, on="ucionica", how="inner")
+    # učionica istog (categorical) dtypea kao raspored: kasniji join s učionicama
+    # termina ide po int kodovima (fetch_tick to već radi za svoje logove)
+    j = log_df
+    if j["ucionica"].dtype != windows["ucionica"].dtype:
+        j = j.assign(ucionica=j["ucionica"].astype(windows["ucionica"].dtype))
 
-    m = (j["time"] >= j["window_start"]) & (j["time"] < j["window_end"])
-    j = j[m].copy()
-
-    j["delta"] = (j["time"] - j["termin"]).abs()
-    j = j.sort_values(["time","ucionica","delta"]).drop_duplicates(
-        subset=["time","ucionica","uid_kartice"], keep="first"
-    )
+    # čuvare tek na preživjele retke (prozori odbace većinu logova); map po dictu umjesto merge
+    cuvari = kartice.attrs.get("cuvar_map")
+    if cuvari is None:
+        cuvari = dict(zip(kartice["uid_kartice"].tolist(), kartice["cuvar"].tolist()))
+    j = j.assign(cuvar=j["uid_kartice"].map(cuvari))
 
     out = j.rename(columns={"time": "vrijeme", "uid_kartice": "broj_kartice"})[
         ["ucionica","vrijeme","broj_kartice","cuvar","termin"]
@@ -224,328 +655,624 @@ def assign_logs_to_windows(log_df: pd.DataFrame, windows: pd.DataFrame, kartice:
 # =========================
 # Utility – sortiranje, zebra
 # =========================
+@lru_cache(maxsize=1024)
+def _natkey(v: str) -> tuple:
+    """"A101" → ("A", 101); skup učionica je mali i stalan → regex jednom po učionici"""
+    m = _ROOM_RE.match(v)
+    return (m.group(1), int(m.group(2) or 0))
+
 def sort_rooms_natural(df: pd.DataFrame, col: str = "ucionica", extra_order: list[str] | None = None) -> pd.DataFrame:
     if df is None or df.empty or col not in df.columns:
         return df
-    work = df.copy()
-    pref = work[col].astype(str).str.extract(r"^([A-Za-zČĆŽŠĐ]+)", expand=False).fillna("")
-    num  = work[col].astype(str).str.extract(r"(\d+)", expand=False)
-    num  = pd.to_numeric(num, errors="coerce").fillna(0).astype(int)
-    work["__pref"] = pref; work["__num"] = num
-    sort_cols = ["__pref","__num"] + (extra_order or []) + [col]
-    work = work.sort_values(sort_cols).drop(columns=["__pref","__num"])
-    return work
-
-def make_group_stripes(rows: list[dict]) -> list[dict]:
-    if not rows:
-        return []
-
-    rooms_order = []
-    for r in rows:
-        room = r.get("ucionica")
-        if room and room not in rooms_order:
-            rooms_order.append(room)
-
-    colors = ["#F6FAFF", "#FFF8F2"]
-    styles = []
-    for i, room in enumerate(rooms_order):
-        color = colors[i % 2]
-        # ✨ pre-escape izvan f-stringa (dopušteno)
-        room_escaped = str(room).replace('"', '\\"')
-
-        styles.append({
-            "if": {"filter_query": f'{{ucionica}} = "{room_escaped}"'},
-            "backgroundColor": color,
-        })
-    return styles
-
-
-def _next_page(curr, total):
-    if total <= 1:
-        return 0
-    curr = (curr or 0)
-    return (curr + 1) % total
+    vals = df[col].astype(str).tolist()
+    extra = [df[c].tolist() for c in (extra_order or [])]
+    # obični Python sort s tuple ključem: (pref, num, *extra_order, col)
+    order = sorted(range(len(vals)), key=lambda i: (*_natkey(vals[i]), *(e[i] for e in extra), vals[i]))
+    return df.iloc[order]
+
+def to_records(df: pd.DataFrame) -> list[dict]:
+    """
+    Kao df.to_dict("records"), ali po stupcima (.tolist()) → samo Python primitivi.
+    DataTable prima upravo records; tablice imaju desetak-dvadeset redaka, pa
+    binarni (Arrow) prijenos u preglednik ne bi ništa uštedio.
+    """
+    cols = df.columns.tolist()
+    return [dict(zip(cols, row)) for row in zip(*(df[c].tolist() for c in cols))]
+
+def format_times(s: pd.Series, fmt: str = TIME_FMT) -> pd.Series:
+    """strftime samo nad jedinstvenim vremenima, pa map natrag na retke"""
+    lookup = {t: t.strftime(fmt) for t in s.dropna().unique()}
+    return s.map(lookup)
+
+# zebra po učionici: dva fiksna pravila po skrivenom polju "grupa" umjesto
+# jednog filter_query pravila po učionici (preglednik ih parsira za svaki redak).
+# Pravila su stalna (u layoutu), a "grupa" upisuje preglednik (_SHOW_TABLE_JS).
+_STRIPE_COLORS = ["#F6FAFF", "#FFF8F2"]
+GROUP_STRIPES = [
+    {"if": {"filter_query": f"{{grupa}} = {i}"}, "backgroundColor": color}
+    for i, color in enumerate(_STRIPE_COLORS)
+]
 
 def initial_date():
     # md = fetch_min_date_in_raspored()
     return date.today() # md if md else date.today()
 
-def is_in_login_autopage_window(d: date, hhmm: str) -> bool:
-    try:
-        h, m = map(int, hhmm.split(":"))
-    except Exception:
+def triggered_by_timer_only() -> bool:
+    """True ako je callback okinuo samo refresh tik (ne korisnik)."""
+    ctx = dash.callback_context
+    sources = {t["prop_id"].split(".")[0] for t in ctx.triggered} if ctx.triggered else {""}
+    return sources <= {"timer-tick"}
+
+def skip_timer_refresh(last: dict | None, datum: str | None, hhmm: str | None) -> bool:
+    """
+    True ako je callback okinuo samo timer, a ista kombinacija datum/termin je već
+    poslana i: ili je to bilo prije manje od MIN_REFRESH_SEC (npr. odmah nakon
+    promjene filtera), ili datum nije današnji (prošli dan se više ne mijenja;
+    npr. stranica ostala otvorena preko ponoći, a refresh-cfg još nije ugašen).
+    """
+    if not triggered_by_timer_only():
         return False
-    T = datetime.combine(d, dtime(h, m))
-    now = datetime.now()  # ako želiš fiksnu TZ: zamijeni s now_local_naive()
-    return (T - timedelta(minutes=PAGE_AUTO_IN_BEFORE_MIN) <= now < T)
+    if not last or last.get("key") != [datum, hhmm]:
+        return False
+    return (time.time() - last.get("ts", 0) < MIN_REFRESH_SEC
+            or not is_selected_today(datum))
+
+@lru_cache(maxsize=64)
+def _parse_iso_date(s: str) -> date:
+    """ISO datum iz DatePickera ("2025-06-01" ili s vremenom) → date, bez pandas parsera"""
+    return date.fromisoformat(s[:10])
 
 def is_selected_today(d_iso: str | None) -> bool:
     if not d_iso:
         return False
-    return pd.to_datetime(d_iso).date() == date.today()
+    return _parse_iso_date(d_iso) == date.today()
     # Ako želiš striktno po zoni/bazi, zamijeni date.today() s now_local_naive().date()
 
+def is_in_fast_refresh_window(d: date, hhmm: str) -> bool:
+    """[T - PAGE_AUTO_IN_BEFORE_MIN, T): prozor prijava, u kojem preglednik osvježava s REFRESH_FAST_MS"""
+    try:
+        h, m = map(int, hhmm.split(":"))
+    except Exception:
+        return False
+    T = datetime.combine(d, dtime(h, m))
+    return T - timedelta(minutes=PAGE_AUTO_IN_BEFORE_MIN) <= datetime.now() < T
+
+# =========================
+# Tablice + snapshot (pozadinska nit)
+# =========================
+# dan → (raspored, {termin_hm: učionice}); indeks vrijedi dok je u cacheu isti raspored
+_ROOMS_INDEX: dict[date, tuple[pd.DataFrame, dict]] = {}
+_ROOMS_INDEX_LOCK = threading.Lock()
+
+def rooms_for_termin(raspored: pd.DataFrame, d: date, hhmm: str) -> pd.DataFrame:
+    """Učionice s terminom u HH:MM (jedan stupac ucionica) — dict lookup umjesto maske po rasporedu."""
+    with _ROOMS_INDEX_LOCK:
+        hit = _ROOMS_INDEX.get(d)
+    if hit is None or hit[0] is not raspored:
+        index = {hm: g[["ucionica"]].drop_duplicates()
+                 for hm, g in raspored.groupby("termin_hm", sort=False)}
+        hit = (raspored, index)
+        with _ROOMS_INDEX_LOCK:
+            if len(_ROOMS_INDEX) >= 8:      # stari dani van
+                _ROOMS_INDEX.clear()
+            _ROOMS_INDEX[d] = hit
+    rooms = hit[1].get(_hm(hhmm))
+    return rooms if rooms is not None else raspored.iloc[:0][["ucionica"]]
+
+# (state, dan, termin) → (potpis logova, raspored, kartice, tablica); raspored/kartice
+# držimo kao reference pa se usporedbom identiteta vidi je li cache donio nove
+_TABLE_MEMO: dict[tuple, tuple] = {}
+_TABLE_MEMO_LOCK = threading.Lock()
+_TABLE_MEMO_MAX = 64
+
+def _table_memo_get(key: tuple, sig: tuple, raspored: pd.DataFrame, kartice: pd.DataFrame):
+    with _TABLE_MEMO_LOCK:
+        hit = _TABLE_MEMO.get(key)
+    if hit is None:
+        return None
+    h_sig, h_rasp, h_kart, table = hit
+    return table if (h_sig == sig and h_rasp is raspored and h_kart is kartice) else None
+
+def _table_memo_put(key: tuple, sig: tuple, raspored: pd.DataFrame, kartice: pd.DataFrame, table: list):
+    with _TABLE_MEMO_LOCK:
+        _TABLE_MEMO.pop(key, None)
+        _TABLE_MEMO[key] = (sig, raspored, kartice, table)
+        while len(_TABLE_MEMO) > _TABLE_MEMO_MAX:      # najstariji van
+            _TABLE_MEMO.pop(next(iter(_TABLE_MEMO)))
+
+def build_table(d: date, hhmm: str, *, state, build_windows_fn, time_col_name,
+                use_cache: bool = True) -> tuple[list[dict], bool]:
+    """
+    (records, ok) jedne tablice za dan d i termin HH:MM (sortirani po učionici).
+    ok = False ako je neki frame nastao zbog greške u bazi → takvu tablicu ne pamtimo.
+    """
+    # raspored za dan + logovi + kartice, jednim round-tripom (ili iz cachea)
+    raspored, logins, logouts, kartice = fetch_tick(d, hhmm, use_cache=use_cache)
+    # greška putuje s frameom (attrs["db_error"]), ne preko globalnog LAST_DB_ERROR
+    # koji istovremeno prepisuju nit snapshota, pool i requesti
+    ok = not any(f is not None and f.attrs.get("db_error") for f in (raspored, logins, logouts, kartice))
+    if raspored is None or raspored.empty:
+        return [], ok
+    logs = logins if state == 1 else logouts
+
+    # isti raspored/kartice (isti objekti iz cachea) i isti logovi → ista tablica
+    memo_key = (state, d, hhmm)
+    sig = (len(logs), logs["time"].max() if len(logs) else None)
+    hit = _table_memo_get(memo_key, sig, raspored, kartice)
+    if hit is not None:
+        return hit, True          # u memo idu samo tablice bez greške
+
+    # sve učionice koje imaju termin u odabranom satu (da se prikazuju i bez loga)
+    rooms = rooms_for_termin(raspored, d, hhmm)
+    if rooms.empty:
+        return [], ok
+
+    windows = build_windows_fn(raspored, hhmm, d)
+    assigned = assign_logs_to_windows(logs, windows, kartice)
+
+    cols = [time_col_name, "broj_kartice", "cuvar"]
+    # merge da zadržimo sve učionice; formatiranje vremena
+    # (assigned i rooms su već svježi okviri, ne kopije cachea → mijenjamo ih izravno)
+    if assigned is not None and not assigned.empty:
+        assigned["vrijeme"] = format_times(assigned["vrijeme"])   # već datetime64 iz _prep_log
+        merged = rooms.merge(
+            assigned.rename(columns={"vrijeme": time_col_name})[["ucionica", *cols]],
+            on="ucionica", how="left",
+        )
+        # left merge ostavi NaN samo za učionice bez loga; stupac po stupac
+        # (bez privremenog okvira od tri stupca kao kod merged[cols].fillna)
+        for c in cols:
+            merged[c] = merged[c].fillna("—")
+    else:
+        # nema dodijeljenih logova → stupci odmah "—", bez NaN i fillna
+        merged = rooms.assign(**dict.fromkeys(cols, "—"))
+
+    # prirodni poredak učionica (zebru po učionici dodaje preglednik)
+    out_df = sort_rooms_natural(
+        merged[["ucionica", *cols]],
+        col="ucionica", extra_order=[time_col_name]
+    )
+    recs = to_records(out_df)
+    if ok:
+        _table_memo_put(memo_key, sig, raspored, kartice, recs)
+    return recs, ok
+
+# strana → parametri build_table (isto što i callbackovi prijava/odjava)
+TABLE_SIDES = {
+    "in":  dict(state=1, build_windows_fn=build_windows_for_time_login,  time_col_name="vrijeme_prijave"),
+    "out": dict(state=0, build_windows_fn=build_windows_for_time_logout, time_col_name="vrijeme_odjave"),
+}
+
+# (strana, datum, termin) → (složeno u [monotonic], records, logovi do [datetime]); nit ga zamijeni cijelog
+_SNAPSHOT: dict[tuple, tuple[float, list, datetime]] = {}
+# (strana, datum, termin) → kad ga je neki preglednik zadnji put tražio; nit osvježava samo te ključeve
+_SNAPSHOT_ACCESS: dict[tuple, float] = {}
+_SNAPSHOT_LOCK = threading.Lock()
+_SNAPSHOT_THREAD: threading.Thread | None = None
+SNAPSHOT_STATS = {"hit": 0, "miss": 0}
+
+# snapshot smije kasniti najviše jedan krug niti, i nikad više od sporog auto-refresha
+# (brzi refresh u prozoru prijava snapshot ionako preskače, vidi _table_for)
+SNAPSHOT_MAX_AGE = min(2 * SNAPSHOT_SEC, REFRESH_SLOW_MS / 1000)
+
+# ključ je aktivan dok ga netko traži barem jednom u nekoliko sporih refresha
+SNAPSHOT_ACTIVE_SEC = 3 * REFRESH_SLOW_MS / 1000
+
+def snapshot_touch(key: tuple):
+    """Zabilježi da preglednik gleda ovu tablicu (samo takve nit drži svježima)."""
+    with _SNAPSHOT_LOCK:
+        _SNAPSHOT_ACCESS[key] = time.monotonic()
+
+def snapshot_get(key: tuple) -> list | None:
+    """Tablica iz snapshota ako je svježa (mlađa od SNAPSHOT_MAX_AGE)."""
+    with _SNAPSHOT_LOCK:
+        hit = _SNAPSHOT.get(key)
+        fresh = hit is not None and time.monotonic() - hit[0] < SNAPSHOT_MAX_AGE
+        SNAPSHOT_STATS["hit" if fresh else "miss"] += 1
+        return hit[1] if fresh else None
+
+def refresh_snapshot():
+    """
+    Današnje tablice koje netko gleda (tražene unutar SNAPSHOT_ACTIVE_SEC) — jednom
+    za sve preglednike. Nitko ne gleda → nema ni upita u bazu.
+    """
+    d = date.today()
+    day = d.isoformat()
+    now = time.monotonic()
+    with _SNAPSHOT_LOCK:
+        for k in [k for k, t in _SNAPSHOT_ACCESS.items() if now - t >= SNAPSHOT_ACTIVE_SEC or k[1] != day]:
+            del _SNAPSHOT_ACCESS[k]
+        active = sorted(_SNAPSHOT_ACCESS)
+        old = dict(_SNAPSHOT)
+    fresh = {}
+    raspored = fetch_raspored_for_date(d) if active else None
+    if raspored is not None and not raspored.empty:
+        for key in active:
+            side, _, hhmm = key
+            if is_in_fast_refresh_window(d, hhmm):   # taj termin se ne služi iz snapshota
+                continue
+            bounds = log_time_bounds(raspored, d, hhmm)
+            if bounds is None:                        # nema takvog termina
+                continue
+            prev = old.get(key)
+            if prev is not None and prev[2] >= bounds[1]:
+                # složena nakon što su se zatvorili svi prozori termina → više se ne mijenja
+                fresh[key] = (time.monotonic(), prev[1], prev[2])
+                continue
+            logs_until = datetime.now()
+            recs, ok = build_table(d, hhmm, **TABLE_SIDES[side])
+            if recs and ok:
+                fresh[key] = (time.monotonic(), recs, logs_until)
+    with _SNAPSHOT_LOCK:
+        _SNAPSHOT.clear()          # usput ispadnu jučerašnji dan i tablice koje nitko ne gleda
+        _SNAPSHOT.update(fresh)
+
+def _snapshot_loop():
+    while True:
+        try:
+            refresh_snapshot()
+        except Exception as e:
+            print("⛔ Greška u snapshotu:", e)
+        time.sleep(SNAPSHOT_SEC)
+
+def ensure_snapshot_thread():
+    """Nit se pali lijeno, u svakom workeru posebno (gunicorn --preload forka nakon importa)."""
+    global _SNAPSHOT_THREAD
+    if SNAPSHOT_SEC <= 0 or (_SNAPSHOT_THREAD is not None and _SNAPSHOT_THREAD.is_alive()):
+        return
+    with _SNAPSHOT_LOCK:
+        if _SNAPSHOT_THREAD is None or not _SNAPSHOT_THREAD.is_alive():
+            _SNAPSHOT_THREAD = threading.Thread(target=_snapshot_loop, name="snapshot", daemon=True)
+            _SNAPSHOT_THREAD.start()
+
 # =========================
 # DASH APLIKACIJA
 # =========================
 app = Dash(__name__, suppress_callback_exceptions=True)
 server = app.server
 
+# odgovori callbackova (tablice, stilovi) idu kroz plotly.io.json → orjson je
+# višestruko brži od stdlib json; bez paketa ostaje zadani encoder
+try:
+    import orjson  # noqa: F401
+    import plotly.io as pio
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
+# gzip/brotli odgovora: tablice se šalju cijele svaki refresh, a nazivi učionica
+# i vremena se ponavljaju → komprimira se višestruko; bez paketa ide nekomprimirano
+server.config.update(
+    COMPRESS_MIMETYPES=["application/json", "text/html", "text/css", "application/javascript"],
+    COMPRESS_LEVEL=4,      # gzip: omjer CPU / veličina
+    COMPRESS_BR_LEVEL=4,
+)
+try:
+    from flask_compress import Compress
+    Compress(server)
+except ImportError:
+    pass
+
+# /assets/* Dash linka s ?m=<mtime> (favicon s ?v=<verzija>) → URL se mijenja s datotekom,
+# pa ga preglednik smije držati godinu dana (component-suites Dash već sam označi)
+@server.after_request
+def cache_static_assets(resp):
+    req = flask.request
+    if ((req.path.startswith("/assets/") and "m" in req.args)
+            or (req.path == "/_favicon.ico" and "v" in req.args)):
+        resp.cache_control.no_cache = None
+        resp.cache_control.public = True
+        resp.cache_control.max_age = 31_536_000
+        resp.cache_control.immutable = True
+    return resp
+
+@server.route("/flush-cache", methods=["POST"])   # samo POST: prefetch/crawler ne smije brisati cache
+def flush_cache_endpoint():
+    flush_caches()
+    return {"ok": True}
+
+@server.route("/snapshot-stats")
+def snapshot_stats_endpoint():
+    with _SNAPSHOT_LOCK:
+        return {**SNAPSHOT_STATS, "keys": len(_SNAPSHOT), "active": len(_SNAPSHOT_ACCESS)}
+
 
 # Header
 image_id = "1IVYXW6Ye48OeHt6Xo89gJPp7NRySHwFH"
 image_url = f"https://lh3.googleusercontent.com/d/{image_id}"
 
-app.layout = html.Div(
-    [
-        # HEADER
-        html.Div(
-            [
-                html.Img(src=image_url, style={"height": "80px", "marginRight": "20px"}),
-                html.H6(
-                    "Ispiti - evidencija čuvara",
-                    style={"color": "#ffffff", "fontWeight": "bold", "fontSize": "30px"},
-                ),
-            ],
-            style={
-                "display": "flex",
-                "alignItems": "center",
-                "backgroundColor": "#151515",
-                "padding": "10px",
-                "borderRadius": "6px",
-                "height":"60px"
-            },
-        ),
-
-        # GLAVNI NASLOV
-        # html.H1("Evidencija čuvara", className="page-title"),
-
-        # FILTERI
-        html.Div(
-            [
+def _inline_image(url: str, timeout: float = 5) -> str:
+    """Slika kao data URI (jednom, pri učitavanju modula) → preglednik ne ide na Google; greška → URL"""
+    try:
+        with urlopen(url, timeout=timeout) as r:
+            ctype = r.headers.get_content_type()
+            body = r.read()
+        if not ctype.startswith("image/"):
+            return url
+        return f"data:{ctype};base64,{base64.b64encode(body).decode('ascii')}"
+    except Exception as e:
+        print("⚠️ Header slika nije dohvaćena, ostaje URL:", e)
+        return url
+
+HEADER_IMG_SRC = _inline_image(image_url)
+
+# Tablice prijava/odjava: isti izgled, razlikuje se samo stupac vremena.
+# Stilovi su konstante modula → serve_layout ih ne gradi iznova po učitavanju.
+_TABLE_STYLE_CELL = {"fontFamily": "Inter, system-ui", "padding": "8px", "fontSize": "16px"}
+_TABLE_STYLE_HEADER = {
+    "backgroundColor": "#be1e67",
+    "color": "white",
+    "fontWeight": "bold",
+    "textAlign": "center",
+    "border": "1px solid #ddd",
+}
+_TABLE_STYLE_TABLE = {"maxHeight": "70vh", "overflowY": "auto", "borderRadius": "6px"}
+_TABLE_CSS = [{"selector": ".dash-spreadsheet", "rule": "border-collapse: collapse !important;"}]
+# širine stupaca; None = stupac vremena (id ovisi o tablici)
+_TABLE_WIDTHS = [("ucionica", "12%"), (None, "33%"), ("broj_kartice", "25%"), ("cuvar", "30%")]
+
+def _table(table_id: str, time_label: str, time_col: str) -> dash_table.DataTable:
+    """DataTable prijava ili odjava (time_col = "vrijeme_prijave" / "vrijeme_odjave")"""
+    return dash_table.DataTable(
+        id=table_id,
+        columns=[
+            {"name": "Učionica",     "id": "ucionica"},
+            {"name": time_label,     "id": time_col},
+            {"name": "Broj kartice", "id": "broj_kartice"},
+            {"name": "Čuvar",        "id": "cuvar"},
+        ],
+        style_cell=_TABLE_STYLE_CELL,
+        style_cell_conditional=[
+            {"if": {"column_id": col or time_col}, "width": w} for col, w in _TABLE_WIDTHS
+        ],
+        style_header=_TABLE_STYLE_HEADER,
+        css=_TABLE_CSS,
+        sort_action="native",
+        # native paging već drži DOM na page_size redaka; virtualization +
+        # fixed_rows ovdje ne donose ništa, a kvare % širine stupaca.
+        # Ni "custom" paging: listanje bi opet išlo preko servera
+        # (_ROTATE_PAGES_JS), a tablica je samo desetak-dvadeset redaka
+        page_action="native",
+        filter_action="none",
+        style_table=_TABLE_STYLE_TABLE,
+        style_data_conditional=GROUP_STRIPES,
+        page_current=0,
+        page_size=12,
+    )
+
+def serve_layout():
+    """Layout se gradi po učitavanju stranice → initial_date() je uvijek današnji, i nakon ponoći"""
+    return html.Div(
+        [
+            # HEADER
             html.Div(
                 [
-                html.Div(
-                    [
-                        html.Label("Datum:", className="filter-label"),
-                        dcc.DatePickerSingle(
-                            id="picker-datum",
-                            date=initial_date(),
-                            display_format="D.M.YYYY.",
-                            first_day_of_week=1,
-                            className="my-dropdown",
-                        ),
-                    ],
-                    className="filter-item",
-                ),
-                html.Div(
-                    [
-                        html.Label("Termin:", className="filter-label"),
-                        dcc.Dropdown(
-                            id="dropdown-termin",
-                            placeholder="Odaberi termin",
-                            className="my-dropdown",
-                            clearable=False,
-                        ),
-                    ],
-                    className="filter-item",
-                ),
+                    html.Img(src=HEADER_IMG_SRC, style={"height": "80px", "marginRight": "20px"}),
+                    html.H6(
+                        "Ispiti - evidencija čuvara",
+                        style={"color": "#ffffff", "fontWeight": "bold", "fontSize": "30px"},
+                    ),
                 ],
-                className="filter-termini",
+                style={
+                    "display": "flex",
+                    "alignItems": "center",
+                    "backgroundColor": "#151515",
+                    "padding": "10px",
+                    "borderRadius": "6px",
+                    "height":"60px"
+                },
             ),
+
+            # GLAVNI NASLOV
+            # html.H1("Evidencija čuvara", className="page-title"),
+
+            # FILTERI
             html.Div(
                 [
                 html.Div(
                     [
-                        html.Label("Redaka po stranici:", className="filter-label"),
-                        dcc.Dropdown(
-                            id="page-size",
-                            options=[{"label": str(n), "value": n} for n in (4, 10, 12, 14, 16, 18)],
-                            value=12, clearable=False, className="my-dropdown",
+                    html.Div(
+                        [
+                            html.Label("Datum:", className="filter-label"),
+                            dcc.DatePickerSingle(
+                                id="picker-datum",
+                                date=initial_date(),
+                                display_format="D.M.YYYY.",
+                                first_day_of_week=1,
+                                className="my-dropdown",
                             ),
+                        ],
+                        className="filter-item",
+                    ),
+                    html.Div(
+                        [
+                            html.Label("Termin:", className="filter-label"),
+                            dcc.Dropdown(
+                                id="dropdown-termin",
+                                placeholder="Odaberi termin",
+                                className="my-dropdown",
+                                clearable=False,
+                            ),
+                        ],
+                        className="filter-item",
+                    ),
                     ],
-                    className="filter-item",
+                    className="filter-termini",
                 ),
                 html.Div(
                     [
-                        html.Label("Promjena stranice:", className="filter-label"),
-                        dcc.Dropdown(
-                            id="page-interval",
-                            options=[
-                                {"label": "5 s",  "value": 5_000},
-                                {"label": "30 s", "value": 30_000},
-                                {"label": "60 s", "value": 60_000},
-                                {"label": "90 s", "value": 90_000},
-                            ],
-                            value=60_000, clearable=False, className="my-dropdown",
-                        ),
+                    html.Div(
+                        [
+                            html.Label("Redaka po stranici:", className="filter-label"),
+                            dcc.Dropdown(
+                                id="page-size",
+                                options=[{"label": str(n), "value": n} for n in (4, 10, 12, 14, 16, 18)],
+                                value=12, clearable=False, className="my-dropdown",
+                                ),
+                        ],
+                        className="filter-item",
+                    ),
+                    html.Div(
+                        [
+                            html.Label("Promjena stranice:", className="filter-label"),
+                            dcc.Dropdown(
+                                id="page-interval",
+                                options=[
+                                    {"label": "5 s",  "value": 5_000},
+                                    {"label": "30 s", "value": 30_000},
+                                    {"label": "60 s", "value": 60_000},
+                                    {"label": "90 s", "value": 90_000},
+                                ],
+                                value=60_000, clearable=False, className="my-dropdown",
+                            ),
+                        ],
+                        className="filter-item",
+                    ),
                     ],
-                    className="filter-item",
+                    className="filter-stranica",
                 ),
                 ],
-                className="filter-stranica",
+                className="filter-bar",
             ),
-            ],
-            className="filter-bar",
-        ),
 
-        html.Div(id="db-status", style={"color": "#b00020", "marginBottom": 8}),
+            html.Div(id="db-status", style={"color": "#b00020", "marginBottom": 8}),
 
-        # TABLICE (Prijave lijevo, Odjave desno)
-        html.Div(
-            [
-                # ----- PRIJAVE -----
-                html.Div(
-                    [
-                        html.Div(
-                            [
-                                html.Div(  # lijevi dio: naslov + badge
+            # TABLICE (Prijave lijevo, Odjave desno)
+            html.Div(
+                [
+                    # ----- PRIJAVE -----
+                    html.Div(
+                        [
+                            html.Div(
+                                [
+                                    html.Div(  # lijevi dio: naslov + badge
+                                        [
+                                        html.H3("Prijave čuvara", className="card-title"),
+                                        html.Span("", 
+                                                id="auto-indicator-in",
+                                                className="badge-auto",
+                                                title="Automatsko listanje",
+                                                style={"display": "none"}),
+                                        ],
+                                        className="title-with-badge",
+                                    ),
+                                    html.Div(
+                                        html.Span(
+                                            "", id="refresh-indicator-in",
+                                            className="badge-auto",
+                                            title="Auto-refresh",
+                                            style={"display": "none"},
+                                        ),
+                                        id="refresh-box-in",
+                                        className="checkbox-box",
+                                    ),
+                                ],
+                                className="card-header",
+                            ),
+                            _table("tbl-prijave", "Vrijeme prijave", "vrijeme_prijave"),
+                        ],
+                        className="card",
+                    ),
+
+                    # ----- ODJAVE -----
+                    html.Div(
+                        [
+                            html.Div(
+                                [
+                                html.Div(  # naslov + badge
                                     [
-                                    html.H3("Prijave čuvara", className="card-title"),
-                                    html.Span("", 
-                                            id="auto-indicator-in",
+                                        html.H3("Odjave čuvara", className="card-title"),
+                                        html.Span("", 
+                                            id="auto-indicator-out",
                                             className="badge-auto",
                                             title="Automatsko listanje",
-                                            style={"display": "none"}),
+                                            style={"display": "none"},
+                                        ),
                                     ],
                                     className="title-with-badge",
-                                ),
+                                ),   
                                 html.Div(
                                     html.Span(
-                                        "", id="refresh-indicator-in",
+                                        "", id="refresh-indicator-out",
                                         className="badge-auto",
                                         title="Auto-refresh",
                                         style={"display": "none"},
                                     ),
-                                    id="refresh-box-in",
+                                    id="refresh-box-out",
                                     className="checkbox-box",
                                 ),
-                            ],
-                            className="card-header",
-                        ),
-                        dash_table.DataTable(
-                            id="tbl-prijave",
-                            columns=[
-                                {"name": "Učionica",        "id": "ucionica"},
-                                {"name": "Vrijeme prijave", "id": "vrijeme_prijave"},
-                                {"name": "Broj kartice",    "id": "broj_kartice"},
-                                {"name": "Čuvar",           "id": "cuvar"},
-                            ],
-                            style_cell={"fontFamily": "Inter, system-ui", "padding": "8px", "fontSize": "16px"},
-                            style_cell_conditional=[
-                                {"if": {"column_id": "ucionica"},        "width": "12%"},
-                                {"if": {"column_id": "vrijeme_prijave"}, "width": "33%"},
-                                {"if": {"column_id": "broj_kartice"},    "width": "25%"},
-                                {"if": {"column_id": "cuvar"},           "width": "30%"},
-                            ],
-                            style_header={
-                                "backgroundColor": "#be1e67",
-                                "color": "white",
-                                "fontWeight": "bold",
-                                "textAlign": "center",
-                                "border": "1px solid #ddd",
-                            },
-                            css=[{"selector": ".dash-spreadsheet", "rule": "border-collapse: collapse !important;"}],
-                            sort_action="native",
-                            page_action="native",
-                            filter_action="none",
-                            style_table={"maxHeight": "70vh", "overflowY": "auto", "borderRadius": "6px"},
-                            style_data_conditional=[],
-                            page_current=0,
-                            page_size=12,
-                        ),
-                    ],
-                    className="card",
-                ),
-
-                # ----- ODJAVE -----
-                html.Div(
-                    [
-                        html.Div(
-                            [
-                            html.Div(  # naslov + badge
-                                [
-                                    html.H3("Odjave čuvara", className="card-title"),
-                                    html.Span("", 
-                                        id="auto-indicator-out",
-                                        className="badge-auto",
-                                        title="Automatsko listanje",
-                                        style={"display": "none"},
-                                    ),
                                 ],
-                                className="title-with-badge",
-                            ),   
-                            html.Div(
-                                html.Span(
-                                    "", id="refresh-indicator-out",
-                                    className="badge-auto",
-                                    title="Auto-refresh",
-                                    style={"display": "none"},
-                                ),
-                                id="refresh-box-out",
-                                className="checkbox-box",
+                                className="card-header",
                             ),
-                            ],
-                            className="card-header",
-                        ),
-                        dash_table.DataTable(
-                            id="tbl-odjave",
-                            columns=[
-                                {"name": "Učionica",        "id": "ucionica"},
-                                {"name": "Vrijeme odjave",  "id": "vrijeme_odjave"},
-                                {"name": "Broj kartice",    "id": "broj_kartice"},
-                                {"name": "Čuvar",           "id": "cuvar"},
-                            ],
-                            style_cell={"fontFamily": "Inter, system-ui", "padding": "8px", "fontSize": "16px"},
-                            style_cell_conditional=[
-                                {"if": {"column_id": "ucionica"},        "width": "12%"},
-                                {"if": {"column_id": "vrijeme_odjave"},  "width": "33%"},
-                                {"if": {"column_id": "broj_kartice"},    "width": "25%"},
-                                {"if": {"column_id": "cuvar"},           "width": "30%"},
-                            ],
-                            style_header={
-                                "backgroundColor": "#be1e67",
-                                "color": "white",
-                                "fontWeight": "bold",
-                                "textAlign": "center",
-                                "border": "1px solid #ddd",
-                            },
-                            css=[{"selector": ".dash-spreadsheet", "rule": "border-collapse: collapse !important;"}],
-                            sort_action="native",
-                            page_action="native",
-                            filter_action="none",
-                            style_table={"maxHeight": "70vh", "overflowY": "auto", "borderRadius": "6px"},
-                            style_data_conditional=[],
-                            page_current=0,
-                            page_size=12,
-                        ),
-                    ],
-                    className="card",
-                ),
-            ],
-            className="tables-row",
-        ),
-
-        # dva odvojena timera
-        dcc.Interval(id="timer-in",  interval=60_000, n_intervals=0),
-        dcc.Interval(id="timer-out", interval=60_000, n_intervals=0),
-
-        dcc.Interval(id="pager-in",  interval=60_000, n_intervals=0),  
-        dcc.Interval(id="pager-out", interval=60_000, n_intervals=0),
+                            _table("tbl-odjave", "Vrijeme odjave", "vrijeme_odjave"),
+                        ],
+                        className="card",
+                    ),
+                ],
+                className="tables-row",
+            ),
 
-        dcc.Interval(id="pulse",     interval=60_000, n_intervals=0),
+            # jedan master timer; preglednik iz njega izvodi tikove za refresh / paging / pulse
+            # (samo dok je kartica vidljiva) → server vidi samo tikove koji su stvarno na redu
+            dcc.Interval(id="master", interval=MASTER_TICK_MS, n_intervals=0),
+            dcc.Store(id="timer-tick"),
+            dcc.Store(id="pager-tick"),
+            dcc.Store(id="pulse-tick"),
+            # {"enabled", "ms"} za auto-refresh tablica (postavlja preglednik, clientside)
+            dcc.Store(id="refresh-cfg"),
+            # smije li se lijeva / desna tablica sama listati (clientside, uz refresh-cfg)
+            dcc.Store(id="autopage-in"),
+            dcc.Store(id="autopage-out"),
+
+            # kad su tablice zadnji put osvježene + hash poslanih (za preskakanje suvišnih tikova)
+            dcc.Store(id="last-refresh"),
+            # obje tablice iz compute_tables; u DataTable ih prepisuje preglednik
+            dcc.Store(id="tables-data"),
+            # datum + termin tek nakon što se filteri smire (debounce u pregledniku)
+            dcc.Store(id="filters-debounced"),
+
+        ],
+        style={"maxWidth": "1200px", "margin": "15px auto", "padding": "0 10px"},
+    )
 
-    ],
-    style={"maxWidth": "1200px", "margin": "15px auto", "padding": "0 10px"},
-)
+app.layout = serve_layout
 
 # =========================
 # CALLBACKS
 # =========================
+# master tik → refresh / paging / pulse tikovi. Svaki ide dalje samo kad mu dođe red,
+# a skrivena kartica (Page Visibility) ne šalje ništa (nema upita u bazu)
+app.clientside_callback(
+    """
+    function(n, master_ms, refresh, page_ms) {
+        const nu = window.dash_clientside.no_update;
+        if (!n || document.hidden) { return [nu, nu, nu]; }
+        const due = ms => n % Math.max(1, Math.round(ms / master_ms)) === 0;
+        return [
+            refresh && refresh.enabled && due(refresh.ms) ? n : nu,
+            due(page_ms || 60000) ? n : nu,
+            due(PULSE_MS) ? n : nu,
+        ];
+    }
+    """.replace("PULSE_MS", str(PULSE_MS)),
+    Output("timer-tick", "data"),
+    Output("pager-tick", "data"),
+    Output("pulse-tick", "data"),
+    Input("master", "n_intervals"),
+    State("master", "interval"),
+    State("refresh-cfg", "data"),
+    State("page-interval", "value"),
+)
+
+# Poruka se rijetko mijenja → bez istog teksta nema ni patcha DOM-a.
+# Usporedba s trenutnim sadržajem (State), ne s globalnom varijablom,
+# jer svaki browser ima svoj db-status.
 @app.callback(Output("db-status", "children"),
-              Input("timer-in", "n_intervals"),
-              Input("timer-out", "n_intervals"))
-def show_db_status(_, __):
+              Input("timer-tick", "data"),
+              State("db-status", "children"))
+def show_db_status(_, shown):
+    if LAST_DB_ERROR == (shown or ""):
+        raise PreventUpdate
     return LAST_DB_ERROR
 
 # Dropdown termina (HH:MM)
@@ -557,271 +1284,222 @@ def show_db_status(_, __):
 def update_termini(datum):
     if not datum:
         return [], None
-    d = pd.to_datetime(datum).date()
+    d = _parse_iso_date(datum)
+    if _nocache_requested():   # samo taj dan; ostali dani i korisnici zadržavaju cache
+        fetch_raspored_for_date.cache_pop(d)
     raspored = fetch_raspored_for_date(d)
     if raspored is None or raspored.empty:
         return [], None
-    times = sorted(raspored["termin"].dt.strftime("%H:%M").unique().tolist())
+    # sortirani unique nad int termin_hm (np.unique radi oboje odjednom), HH:MM samo za prikaz
+    times = [_hhmm(hm) for hm in np.unique(raspored["termin_hm"].to_numpy()).tolist()]
     options = [{"label": t, "value": t} for t in times]
     value = "18:30" if "18:30" in times else (times[0] if times else None)
     return options, value
 
-# Auto-refresh
-@app.callback(
-    Output("timer-in",  "disabled"),
-    Output("timer-out", "disabled"),
+# Auto-refresh + auto-listanje: sve ovisi samo o datumu, terminu i satu →
+# računa preglednik (new Date()) na pulse / promjenu filtera, bez round-tripa.
+# Prijave: auto-listanje u [T-PAGE_AUTO_IN_BEFORE_MIN, T); odjave: cijeli današnji dan.
+# Refresh tikovi samo kad je danas; u prozoru prijava češće.
+app.clientside_callback(
+    """
+    function(d_iso, hhmm, _pulse) {
+        const now = new Date();
+        const p2 = (x) => String(x).padStart(2, "0");
+        const today = now.getFullYear() + "-" + p2(now.getMonth() + 1) + "-" + p2(now.getDate());
+        const is_today = !!d_iso && d_iso.slice(0, 10) === today;
+
+        let in_window = false;
+        const m = d_iso && hhmm ? /^(\\d{1,2}):(\\d{2})/.exec(hhmm) : null;
+        if (m) {
+            const [y, mo, d] = d_iso.slice(0, 10).split("-").map(Number);
+            const T = new Date(y, mo - 1, d, Number(m[1]), Number(m[2]));
+            in_window = T - BEFORE_MIN * 60000 <= now && now < T;
+        }
+        const fast = is_today && in_window;
+
+        const text  = is_today ? "AUTO-REFRESH" : "";
+        const badge = {display: is_today ? "inline-flex" : "none"};
+        const box   = {display: is_today ? "flex" : "none"};   // cijeli rozi okvir
+        return [
+            {enabled: is_today, ms: fast ? FAST_MS : SLOW_MS},
+            text, badge,
+            text, badge,
+            box, box,
+            in_window, is_today,
+        ];
+    }
+    """.replace("BEFORE_MIN", str(PAGE_AUTO_IN_BEFORE_MIN))
+       .replace("FAST_MS", str(REFRESH_FAST_MS))
+       .replace("SLOW_MS", str(REFRESH_SLOW_MS)),
+    Output("refresh-cfg", "data"),
     Output("refresh-indicator-in",  "children"),
     Output("refresh-indicator-in",  "style"),
     Output("refresh-indicator-out", "children"),
     Output("refresh-indicator-out", "style"),
     Output("refresh-box-in",  "style"),   # ružičasti okvir (prijave)
     Output("refresh-box-out", "style"),   # ružičasti okvir (odjave)
+    Output("autopage-in", "data"),
+    Output("autopage-out", "data"),
     Input("picker-datum", "date"),
-    Input("pulse", "n_intervals"),        # ⇦ NOVO: periodična provjera
+    Input("dropdown-termin", "value"),
+    Input("pulse-tick", "data"),          # periodična provjera
 )
-def auto_refresh_by_today(d_iso, _pulse):
-    is_today = False
-    if d_iso:
-        is_today = (pd.to_datetime(d_iso).date() == date.today())
-
-    # timere palimo samo kad je danas
-    disabled_in  = not is_today
-    disabled_out = not is_today
-
-    # badge tekst + vidljivost
-    text        = "AUTO-REFRESH" if is_today else ""
-    badge_style = {"display": "inline-flex"} if is_today else {"display": "none"}
-
-    # cijeli rozi okvir: prikaži samo kad je danas
-    box_style = {"display": "flex"} if is_today else {"display": "none"}
-
-    return (
-        disabled_in, disabled_out,
-        text, badge_style,
-        text, badge_style,
-        box_style, box_style,
-    )
-
 
-# --- PRIJAVE (lijeva tablica) ---
-@app.callback(
-    Output("tbl-prijave", "data"),
-    Output("tbl-prijave", "style_data_conditional"),
-    Input("timer-in", "n_intervals"),
+def _table_for(side: str, datum: str, hhmm: str, use_cache: bool) -> list:
+    """Jedna tablica (side: "in" = prijave, "out" = odjave): snapshot → cache tablica → izračun."""
+    key = (side, datum, hhmm)
+    d = _parse_iso_date(datum)
+    hit = None
+    if use_cache:
+        if d == date.today():
+            snapshot_touch(key)
+        # u prozoru prijava preglednik osvježava svakih REFRESH_FAST_MS → snapshot bi bio prestar
+        if not is_in_fast_refresh_window(d, hhmm):
+            hit = snapshot_get(key)
+        hit = hit or table_cache_get(key)
+    if hit is not None:
+        return hit
+    recs, ok = build_table(d, hhmm, use_cache=use_cache, **TABLE_SIDES[side])
+    if recs and ok:   # tablicu sklopljenu nakon greške u bazi ne pamtimo
+        table_cache_put(key, recs)
+    return recs
+
+# debounce filtera: promjena datuma okida i reset termina → bez ovoga
+# bi tablice išle u bazu za svaku međuvrijednost; pamtimo samo zadnju nakon 250 ms
+app.clientside_callback(
+    """
+    function(datum, hhmm) {
+        const seq = (window._filtersSeq = (window._filtersSeq || 0) + 1);
+        return new Promise(resolve => setTimeout(() => resolve(
+            seq === window._filtersSeq ? {datum: datum, hhmm: hhmm}
+                                       : window.dash_clientside.no_update
+        ), 250));
+    }
+    """,
+    Output("filters-debounced", "data"),
     Input("picker-datum", "date"),
     Input("dropdown-termin", "value"),
-    prevent_initial_call=False,
 )
-def refresh_logins(_, datum, hhmm):
-    if not datum or not hhmm:
-        return [], []
-    d = pd.to_datetime(datum).date()
-
-    raspored = fetch_raspored_for_date(d)
-    if raspored is None or raspored.empty:
-        return [], []
-
-    # sve učionice za taj sat
-    rooms = (raspored.assign(termin_hhmm=raspored["termin"].dt.strftime("%H:%M"))
-                     .loc[lambda x: x["termin_hhmm"] == hhmm, ["ucionica"]]
-                     .drop_duplicates())
-    # prozori za prijave
-    windows = build_windows_for_time_login(raspored, hhmm)
-
-    logins  = fetch_login_log_for_date(d)
-    kartice = fetch_kartice()
-    assigned = assign_logs_to_windows(logins, windows, kartice)
-
-    if not assigned.empty:
-        assigned = assigned.copy()
-        assigned["vrijeme"] = pd.to_datetime(assigned["vrijeme"]).dt.strftime("%d.%m.%Y. %H:%M:%S")
-        merged = rooms.merge(
-            assigned.rename(columns={"vrijeme":"vrijeme_prijave"})[
-                ["ucionica","vrijeme_prijave","broj_kartice","cuvar"]
-            ],
-            on="ucionica", how="left"
-        )
-    else:
-        merged = rooms.copy()
-        merged["vrijeme_prijave"] = None
-        merged["broj_kartice"]    = None
-        merged["cuvar"]           = None
 
-    merged[["vrijeme_prijave","broj_kartice","cuvar"]] = merged[
-        ["vrijeme_prijave","broj_kartice","cuvar"]
-    ].fillna("—")
-
-    out_df = sort_rooms_natural(
-        merged[["ucionica","vrijeme_prijave","broj_kartice","cuvar"]],
-        col="ucionica", extra_order=["vrijeme_prijave"]
-    )
-    recs = out_df.to_dict("records")
-    return recs, make_group_stripes(recs)
+def _filters(f):
+    """(datum, hhmm) iz filters-debounced storea"""
+    f = f or {}
+    return f.get("datum"), f.get("hhmm")
 
-# --- ODJAVE (desna tablica) ---
+# --- PRIJAVE + ODJAVE: jedan callback po tiku, obje tablice iz istog dohvata ---
 @app.callback(
-    Output("tbl-odjave", "data"),
-    Output("tbl-odjave", "style_data_conditional"),
-    Input("timer-out", "n_intervals"),
-    Input("picker-datum", "date"),
-    Input("dropdown-termin", "value"),
+    Output("tables-data", "data"),
+    Output("last-refresh", "data"),
+    Input("timer-tick", "data"),
+    Input("filters-debounced", "data"),
+    State("last-refresh", "data"),
     prevent_initial_call=False,
 )
-def refresh_logouts(_n, datum, hhmm):
-    # uvijek vrati 2 vrijednosti (data, style)
+def compute_tables(_tick, filters, last):
+    """
+    {"in": {...}, "out": {...}} s retcima obje tablice.
+    Strana koja se od zadnjeg slanja ovom pregledniku nije promijenila ide kao
+    None (preglednik je ne dira); ako se nije promijenila nijedna → PreventUpdate.
+    """
+    datum, hhmm = _filters(filters)
+    if skip_timer_refresh(last, datum, hhmm):
+        raise PreventUpdate
+    stamp = {"key": [datum, hhmm], "ts": time.time(), "h": {}}
     if not datum or not hhmm:
-        return [], []
-
-    d = pd.to_datetime(datum).date()
-
-    # raspored za dan
-    raspored = fetch_raspored_for_date(d)
-    if raspored is None or raspored.empty:
-        return [], []
-
-    # sve učionice koje imaju termin u odabranom satu (da se prikazuju i bez odjave)
-    rooms = (
-        raspored.assign(termin_hhmm=raspored["termin"].dt.strftime("%H:%M"))
-                .loc[lambda x: x["termin_hhmm"] == hhmm, ["ucionica"]]
-                .drop_duplicates()
+        empty = {"data": []}
+        return {"in": empty, "out": empty}, stamp
+
+    use_cache = not _nocache_requested()
+    if use_cache:
+        ensure_snapshot_thread()
+    timer_only = triggered_by_timer_only() and bool(last) and last.get("key") == stamp["key"]
+    prev_h = (last or {}).get("h") or {}
+    out = {}
+    for side in TABLE_SIDES:
+        recs = _table_for(side, datum, hhmm, use_cache)
+        # tik bez promjene → iste retke ne šaljemo (DataTable se ne iscrtava ponovno);
+        # hash zadnje poslane tablice je u last-refresh storeu tog preglednika
+        # (hex string: JS broj gubi preciznost iznad 2^53, a hash() ovisi o PYTHONHASHSEED workera)
+        h = stamp["h"][side] = hashlib.blake2b(repr(recs).encode(), digest_size=8).hexdigest()
+        out[side] = None if (timer_only and prev_h.get(side) == h) else {"data": recs}
+    if all(v is None for v in out.values()):
+        raise PreventUpdate
+    return out, stamp
+
+# tables-data → DataTable (u pregledniku, bez round-tripa); None = strana se nije promijenila.
+# Usput upiše "grupa" (0/1, mijenja se na svakoj novoj učionici; retci su već
+# sortirani po učionici) za stalna GROUP_STRIPES pravila
+_SHOW_TABLE_JS = """
+function(t) {
+    const s = t && t["SIDE"];
+    if (!s) { return window.dash_clientside.no_update; }
+    let grupa = 1, prev = {};
+    return s.data.map(r => {
+        if (r.ucionica !== prev) { grupa ^= 1; prev = r.ucionica; }
+        return Object.assign({grupa: grupa}, r);
+    });
+}
+"""
+for _side, _tbl in (("in", "tbl-prijave"), ("out", "tbl-odjave")):
+    app.clientside_callback(
+        _SHOW_TABLE_JS.replace("SIDE", _side),
+        Output(_tbl, "data"),
+        Input("tables-data", "data"),
     )
 
-    # prozori za odjave: [T, prvi sljedeći termin u danu), po SVIM učionicama tog termina
-    windows = build_windows_for_time_logout(raspored, hhmm, d)
-
-    # odjave (state = 0) i mapiranje u prozore
-    logouts = fetch_logout_log_for_date(d)
-    kartice = fetch_kartice()
-    assigned = assign_logs_to_windows(logouts, windows, kartice)
-
-    # merge da zadržimo sve učionice; formatiranje vremena
-    if assigned is not None and not assigned.empty:
-        assigned = assigned.copy()
-        assigned["vrijeme"] = pd.to_datetime(assigned["vrijeme"]).dt.strftime("%d.%m.%Y. %H:%M:%S")
-        merged = rooms.merge(
-            assigned.rename(columns={"vrijeme": "vrijeme_odjave"})[
-                ["ucionica", "vrijeme_odjave", "broj_kartice", "cuvar"]
-            ],
-            on="ucionica", how="left",
-        )
-    else:
-        merged = rooms.copy()
-        merged["vrijeme_odjave"] = None
-        merged["broj_kartice"]   = None
-        merged["cuvar"]          = None
-
-    merged[["vrijeme_odjave", "broj_kartice", "cuvar"]] = (
-        merged[["vrijeme_odjave", "broj_kartice", "cuvar"]].fillna("—")
+# listanje stranica bez round-tripa na server; reset na prvu stranicu kad
+# korisnik promijeni datum/termin/veličinu stranice
+_ROTATE_PAGES_JS = """
+function(_tick, _d, _hhmm, ps_ctrl, auto, data, ps_tbl, curr) {
+    const ctx = window.dash_clientside.callback_context;
+    const src = ctx.triggered.length ? ctx.triggered[0].prop_id.split(".")[0] : "";
+    if (["picker-datum", "dropdown-termin", "page-size"].includes(src)) { return 0; }
+    if (!auto) { return curr || 0; }
+    const ps = ps_tbl || ps_ctrl || 12;
+    const total = Math.max(1, Math.ceil((data || []).length / ps));
+    return total <= 1 ? 0 : ((curr || 0) + 1) % total;
+}
+"""
+for _tbl, _auto in (("tbl-prijave", "autopage-in"), ("tbl-odjave", "autopage-out")):
+    app.clientside_callback(
+        _ROTATE_PAGES_JS,
+        Output(_tbl, "page_current"),
+        Input("pager-tick", "data"),
+        Input("picker-datum", "date"),
+        Input("dropdown-termin", "value"),
+        Input("page-size", "value"),
+        State(_auto, "data"),
+        State(_tbl, "data"),
+        State(_tbl, "page_size"),
+        State(_tbl, "page_current"),
     )
 
-    # prirodni poredak učionica + zebra po učionici
-    out_df = sort_rooms_natural(
-        merged[["ucionica", "vrijeme_odjave", "broj_kartice", "cuvar"]],
-        col="ucionica", extra_order=["vrijeme_odjave"]
-    )
-    recs = out_df.to_dict("records")
-    stripes = make_group_stripes(recs)
-    return recs, stripes
-
-@app.callback(
-    Output("tbl-prijave", "page_current"),
-    Input("pager-in", "n_intervals"),        # tik-tak za paging
-    Input("picker-datum", "date"),           # reset na promjenu filtera
-    Input("dropdown-termin", "value"),
-    Input("page-size", "value"),
-    State("tbl-prijave", "data"),
-    State("tbl-prijave", "page_size"),
-    State("tbl-prijave", "page_current"),
-)
-def rotate_pages_in(_tick, d_iso, hhmm, page_size_ctrl, data, page_size_tbl, curr):
-    ctx = dash.callback_context
-    # reset na prvu stranicu kad korisnik promijeni datum/termin/veličinu stranice
-    if ctx.triggered:
-        src = ctx.triggered[0]["prop_id"].split(".")[0]
-        if src in ("picker-datum", "dropdown-termin", "page-size"):
-            return 0
-
-    # ako nemamo filtere, ili NISMO u [T-60, T) → ne rotiraj (ostavi trenutačnu stranicu)
-    if not d_iso or not hhmm:
-        return curr or 0
-    d = pd.to_datetime(d_iso).date()
-    if not is_in_login_autopage_window(d, hhmm):
-        return curr or 0
-
-    # u prozoru rotiraj
-    n  = len(data or [])
-    ps = page_size_tbl or page_size_ctrl or 12
-    total = max(1, (n + ps - 1) // ps)
-    return _next_page(curr, total)
-
-@app.callback(
-    Output("tbl-odjave", "page_current"),
-    Input("pager-out", "n_intervals"),
-    Input("picker-datum", "date"),
-    Input("dropdown-termin", "value"),
-    Input("page-size", "value"),
-    State("tbl-odjave", "data"),
-    State("tbl-odjave", "page_size"),
-    State("tbl-odjave", "page_current"),
-)
-def rotate_pages_out(_tick, d_iso, hhmm, page_size_ctrl, data, page_size_tbl, curr):
-    ctx = dash.callback_context
-    # reset na promjenu filtera / veličine stranice
-    if ctx.triggered:
-        src = ctx.triggered[0]["prop_id"].split(".")[0]
-        if src in ("picker-datum", "dropdown-termin", "page-size"):
-            return 0
-
-    # auto-rotiraj samo ako je odabran današnji datum
-    if not is_selected_today(d_iso):
-        return curr or 0
-
-    n  = len(data or [])
-    ps = page_size_tbl or page_size_ctrl or 12
-    total = max(1, (n + ps - 1) // ps)
-    return _next_page(curr, total)
-
-@app.callback(
+# Čisti pass-through → clientside, bez round-tripa na server.
+app.clientside_callback(
+    """
+    function(n) {
+        var v = parseInt(n, 10) || 12;
+        return [v, v];
+    }
+    """,
     Output("tbl-prijave", "page_size"),
     Output("tbl-odjave", "page_size"),
     Input("page-size", "value"),
 )
-def set_page_size(n):
-    return int(n or 12), int(n or 12)
-
-@app.callback(
-    Output("pager-in", "interval"),
-    Output("pager-out", "interval"),
-    Input("page-interval", "value"),
-)
-def set_pager_interval(ms):
-    v = int(ms or 8_000)
-    return v, v
 
-@app.callback(
-    Output("auto-indicator-in", "children"),
-    Output("auto-indicator-in", "style"),
-    Input("pager-in", "n_intervals"),
-    Input("picker-datum", "date"),
-    Input("dropdown-termin", "value"),
-)
-def show_auto_badge(_tick, d_iso, hhmm):
-    if not d_iso or not hhmm:
-        return "", {"display": "none"}
-    d = pd.to_datetime(d_iso).date()
-    on = is_in_login_autopage_window(d, hhmm)
-    # tekst "AUTO" + pulsirajuća točkica (definirana u CSS-u ::after)
-    return ("AUTO", {"display": "inline-flex"}) if on else ("", {"display": "none"})
-
-@app.callback(
-    Output("auto-indicator-out", "children"),
-    Output("auto-indicator-out", "style"),
-    Input("pager-out", "n_intervals"),
-    Input("picker-datum", "date"),
-)
-def show_auto_badge_out(_tick, d_iso):
-    on = is_selected_today(d_iso)
-    return ("AUTO", {"display": "inline-flex"}) if on else ("", {"display": "none"})
+# AUTO badge prati stanje auto-listanja (tekst "AUTO" + pulsirajuća točkica iz CSS-a ::after)
+_AUTO_BADGE_JS = """
+function(on) {
+    return on ? ["AUTO", {display: "inline-flex"}] : ["", {display: "none"}];
+}
+"""
+for _side, _auto in (("in", "autopage-in"), ("out", "autopage-out")):
+    app.clientside_callback(
+        _AUTO_BADGE_JS,
+        Output(f"auto-indicator-{_side}", "children"),
+        Output(f"auto-indicator-{_side}", "style"),
+        Input(_auto, "data"),
+    )
 
 if __name__ == "__main__":
     import os
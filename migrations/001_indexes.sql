@@ -0,0 +1,20 @@
+-- Indeksi za upite iz app.py (q_raspored_for_date, q_log_for_termin).
+-- Svi filtri su oblika [state] = ... AND <datum> >= ... AND <datum> < ...
+-- → index seek + range scan, a INCLUDE stupci pokrivaju SELECT (bez key lookupa).
+-- Skripta je idempotentna, smije se pokrenuti više puta.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'ix_acc_monitor_log_state_time'
+                 AND object_id = OBJECT_ID('dbo.acc_monitor_log'))
+    CREATE INDEX ix_acc_monitor_log_state_time
+        ON dbo.acc_monitor_log ([state], [time])
+        INCLUDE ([card_no], [device_name]);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'ix_raspored_state_termin'
+                 AND object_id = OBJECT_ID('dbo.ispiti_raspored'))
+    CREATE INDEX ix_raspored_state_termin
+        ON dbo.ispiti_raspored ([state], termin)
+        INCLUDE ([učionica]);
+GO